@@ -1,76 +1,68 @@
+import time
+
+# Запоминаем время старта до импорта остальных модулей, чтобы учесть импорт в замере времени запуска
+STARTED_AT = time.perf_counter()
+
 import asyncio
 import os
-import urllib.parse
+from contextlib import AsyncExitStack
 from dotenv import load_dotenv
-from typing import List, Dict
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Dict, Optional
 
+from catalog_module.catalog_manager import CatalogIndex
 from database_module.database_manager import DatabaseModule
 from lisskins_module.lisskins_manager import LisskinsAPIModule
 from telegram_module.telegram_manager import TelegramBot
+from telegram_module.telegram_dispatcher import TelegramDispatcher, load_chat_configs
 from skin_module.skin_manager import SkinManager
+from skin_module.work_queue import run_consumers
+from startup_module.startup_manager import SkinJournal, StartupTimer
+from strategy_module.strategy_manager import StrategyEngine
+
+# Модуль статистики продаж нужен только при заданном STEAM_SALES_TABLE, поэтому импортируется лениво в main
+if TYPE_CHECKING:
+    from stats_module.stats_manager import CorridorStats
 
 load_dotenv()
 
 
-async def parse_skins(db: DatabaseModule, lisskins_api_token: str) -> List[Dict]:
+async def parse_skins(db: DatabaseModule, parser: LisskinsAPIModule, engine: StrategyEngine,
+                      stats: Optional["CorridorStats"] = None) -> List[Dict]:
     """
     Функция парсинга скинов с лисскинса и получения толко выгодных скинов.
 
     :param db: Экземпляр класса DatabaseModule для обращения и работы с базой данных.
-    :param lisskins_api_token: API ключ с сайта лисскинс.
+    :param parser: Экземпляр класса LisskinsAPIModule с уже открытой сессией.
+    :param engine: Экземпляр класса StrategyEngine со стратегиями отбора выгодных скинов.
+    :param stats: Экземпляр класса CorridorStats со свежими средними ценами продаж в Steam. По стандарту None -
+    используются только цены из бд.
 
     :return: Возвращает список со словарями, содержащими данные по выгодным скинам с лисскинс.
     """
-    results = []
-
     # Собираем подходящие скины из базы данных
-    cs2_db_items = await db.load_items("steam")
+    cs2_db_items = await db.load_items("steam", min_corridor_avg=engine.min_corridor_avg)
+
+    # Заменяем средние цены из бд на свежие, посчитанные по потоку продаж
+    if stats:
+        stats.apply(cs2_db_items)
 
     # Парсим данные по всем текущим предметам с сайта лисскинс
-    async with LisskinsAPIModule(api_token=lisskins_api_token) as parser:
-        cs2_lis_items = await parser.parse_with_json_request()
-
-    # Собираем массив из всех скинов из базы данных
-    for item in cs2_db_items.items():
-        item_name = item[0]
-        corridor_avg = item[1]["corridor_avg"]
-
-        # Проверяем есть ли этот предмет в списке скинов с лисскинса
-        if item_name in cs2_lis_items:
-
-            # Считаем прибыльность скина при покупке на сайте
-            min_price = cs2_lis_items[item_name]["min_price"]
-            url = cs2_lis_items[item_name]["url"]
-            selling_after_fee = corridor_avg * 0.856
-            ratio = selling_after_fee / min_price if min_price > 0 else 0
-
-            # Проверяем, если выгода больше 10% - добавляем скин в массив, который потом будем отправлять пользователям
-            if 1.1 <= ratio <= 1.9:
-                profit_abs = selling_after_fee - min_price
-                profit_perc = (ratio - 1.0) * 100.0
-                results.append({
-                    "game_id": "cs2",
-                    "item_name": item_name,
-                    "url": url,
-                    "corridor_avg": round(corridor_avg, 2),
-                    "lis_min_price": round(min_price, 2),
-                    "selling_after_fee": round(selling_after_fee, 2),
-                    "profit_abs": round(profit_abs, 2),
-                    "profit_perc": round(profit_perc, 2)
-                })
-
-    return results
-
-
-def create_message(skin: Dict) -> str:
+    cs2_lis_items = await parser.parse_with_json_request()
+
+    # Применяем все стратегии к скинам из базы данных и с лисскинса за один проход
+    return engine.evaluate(cs2_db_items, cs2_lis_items)
+
+
+def create_message(skin: Dict, catalog: CatalogIndex) -> str:
     """
     Функция для создания сообщения на отправку через бота в телеграм.
 
     :param skin: Словарь с информацией о скине.
+    :param catalog: Каталог предметов с готовыми ссылками на лисскинс и Steam.
 
     :return: Возвращает сообщение, которое будет отправлено в чат.
     """
-    lisskins_url = skin["url"]
+    lisskins_url = catalog.lis_url(skin["name_id"])
     item_name = skin["item_name"]
     corridor_avg = skin["corridor_avg"]
     lis_min = skin["lis_min_price"]
@@ -78,8 +70,7 @@ def create_message(skin: Dict) -> str:
     profit_abs = skin["profit_abs"]
     profit_perc = skin["profit_perc"]
 
-    encoded_name = urllib.parse.quote(item_name)
-    steam_url = f"https://steamcommunity.com/market/listings/730/{encoded_name}"
+    steam_url = catalog.steam_url(skin["name_id"])
 
     return (
         f"🟩 [{item_name}]({lisskins_url})\n"
@@ -94,62 +85,191 @@ def create_message(skin: Dict) -> str:
     )
 
 
-async def sending_loop(tg_bot: TelegramBot, skin_mgr: SkinManager) -> None:
+async def sending_loop(dispatcher: TelegramDispatcher, skin_mgr: SkinManager, catalog: CatalogIndex,
+                       consumers: int = 1, timer: Optional[StartupTimer] = None) -> None:
     """
-    Функция для бесконечной отправки выгодных скинов в чат с интервалом в 5 секунд.
-
-    :param tg_bot: Экземпляр класса TelegramBot для отправки сообщения в чат.
-    :param skin_mgr: Экземпляр класса SkinManager для получение скинов на отправку.
+    Функция для бесконечной раздачи выгодных скинов по очередям чатов. Сообщение о скине создается один раз и
+    переиспользуется для всех чатов, а отправку с нужным интервалом для каждого чата делает сам диспетчер.
+
+    :param dispatcher: Экземпляр класса TelegramDispatcher для рассылки сообщений по чатам.
+    :param skin_mgr: Экземпляр класса SkinManager с очередью скинов на отправку.
+    :param catalog: Каталог предметов с готовыми ссылками для сообщений.
+    :param consumers: Количество параллельных потребителей очереди скинов на отправку.
+    :param timer: Экземпляр класса StartupTimer, в который отмечается первый обработанный скин.
     """
-    while True:
-        skin = await skin_mgr.get_skin_to_send()
-        if skin:
-            message = create_message(skin)
-            await tg_bot.send_message(message)
-        await asyncio.sleep(5)
+    async def notify(skin: Dict) -> None:
+        message = create_message(skin, catalog)
+        await dispatcher.publish(skin, message)
+
+        if timer:
+            timer.first_action()
+
+    await run_consumers(skin_mgr.queues["notify"], notify, consumers)
 
 
-async def parsing_loop(db: DatabaseModule, skin_mgr: SkinManager, lisskins_api_token: str) -> None:
+async def parsing_loop(db: DatabaseModule, skin_mgr: SkinManager, parser: LisskinsAPIModule,
+                       engine: StrategyEngine, stats: Optional["CorridorStats"] = None) -> None:
     """
     Функция для бесконечного парсинга скинов каждыйе 5 минут.
 
     :param db: Экземпляр класса DatabaseModule для работы с базой данных.
-    :param skin_mgr: Экземпляр класса SkinManager для обновления топ 500 самых выгодных скинов.
-    :param lisskins_api_token: API ключ с сайта лисскинс для обращения к нему при парсинге.
+    :param skin_mgr: Экземпляр класса SkinManager для обновления топа самых выгодных скинов.
+    :param parser: Экземпляр класса LisskinsAPIModule с уже открытой сессией.
+    :param engine: Экземпляр класса StrategyEngine, конфиг стратегий перечитывается перед каждым парсингом.
+    :param stats: Экземпляр класса CorridorStats со свежими средними ценами продаж в Steam.
     """
     while True:
-        new_skins = await parse_skins(db, lisskins_api_token)
-        await skin_mgr.update_skins(new_skins)
+        # Если потребители не успевают разбирать скины из очередей - откладываем парсинг, пока скины в очередях
+        # не разберут или они не устареют
+        if skin_mgr.saturated:
+            print("Очереди скинов заполнены, парсинг отложен")
+            await asyncio.sleep(30)
+            continue
+
+        engine.reload_if_changed()
+        new_skins = await parse_skins(db, parser, engine, stats)
+        await skin_mgr.update_skins(new_skins, limit=engine.total_limit)
         await asyncio.sleep(300)
 
 
-async def main(db: DatabaseModule, tg_bot: TelegramBot, skin_mgr: SkinManager) -> None:
+async def stats_loop(db: DatabaseModule, stats: "CorridorStats") -> None:
+    """
+    Функция для заполнения окон продаж в Steam в фоне, не задерживая запуск, и дальнейшего бесконечного
+    подтягивания новых продаж каждые 30 секунд. Если заполнение упало, оно повторяется через 30 секунд, а до его
+    завершения свежие цены в парсинге не применяются.
+
+    :param db: Экземпляр класса DatabaseModule для работы с базой данных.
+    :param stats: Экземпляр класса CorridorStats, в который добавляются новые продажи.
+    """
+    while not stats.ready:
+        try:
+            await stats.backfill(db)
+        except Exception as e:
+            print(f"Ошибка при загрузке продаж Steam: {e}")
+            await asyncio.sleep(30)
+
+    while True:
+        await asyncio.sleep(30)
+        try:
+            await stats.poll(db)
+        except Exception as e:
+            print(f"Ошибка при получении новых продаж Steam: {e}")
+
+
+async def journal_loop(skin_mgr: SkinManager, journal: SkinJournal) -> None:
+    """
+    Функция для сохранения очередей скинов в журнал каждую секунду, если они изменились: после парсинга, а
+    также после каждого обработанного или возвращенного в очередь скина.
+
+    :param skin_mgr: Экземпляр класса SkinManager с очередями скинов.
+    :param journal: Экземпляр класса SkinJournal, в который сохраняются очереди.
+    """
+    saved_version = skin_mgr.version
+    while True:
+        await asyncio.sleep(1)
+        if skin_mgr.version != saved_version:
+            saved_version = skin_mgr.version
+            await journal.save(skin_mgr.snapshot())
+
+
+async def main(db: DatabaseModule, tg_bot: TelegramBot, skin_mgr: SkinManager, catalog: CatalogIndex,
+               timer: StartupTimer) -> None:
     """
     Основная функция, которая запускает процессы парсинга и отправки скинов.
+
+    Подключение к бд с прогревом пула, открытие сессий лисскинс и телеграм и чтение журнала скинов с прошлого
+    запуска идут параллельно, а рассылка начинается сразу после чтения журнала и открытия сессии телеграм, не
+    дожидаясь подключения к бд и первого парсинга.
     """
     # Загружаем API ключ лисскинса, а также данные для подключения к бд из переменных окружения.
     lisskins_api_token = os.getenv("LISSKINS_API_TOKEN")
+    engine = StrategyEngine(catalog, os.getenv("STRATEGY_CONFIG"))
 
     db_host = os.getenv("DB_HOST")
     db_port = os.getenv("DB_PORT")
     db_user = os.getenv("DB_USER")
     db_password = os.getenv("DB_PASSWORD")
     db_name = os.getenv("DB_NAME")
-
-    # Подключаемся к базе данных
-    await db.connect(
-        host=db_host,
-        port=int(db_port),
-        user=db_user,
-        password=db_password,
-        db=db_name
-    )
-
-    # Параллельно запускаем задачу парсинга скинов и отправки этих скинов в чат
-    await asyncio.gather(
-        parsing_loop(db, skin_mgr, lisskins_api_token),
-        sending_loop(tg_bot, skin_mgr)
+    db_pool_min = int(os.getenv("DB_POOL_MIN", "2"))
+    db_pool_max = int(os.getenv("DB_POOL_MAX", "5"))
+
+    parser = LisskinsAPIModule(
+        api_token=lisskins_api_token,
+        catalog=catalog,
+        snapshot_dir=os.getenv("LISSKINS_SNAPSHOT_DIR"),
+        snapshot_compression=os.getenv("LISSKINS_SNAPSHOT_COMPRESSION", "zstd")
     )
+    journal_path = os.getenv("SKIN_JOURNAL_PATH")
+    journal = SkinJournal(journal_path, catalog) if journal_path else None
+
+    async def connect_db() -> None:
+        # Подключаемся к базе данных и прогреваем пул соединений
+        await db.connect(
+            host=db_host,
+            port=int(db_port),
+            user=db_user,
+            password=db_password,
+            db=db_name,
+            minsize=db_pool_min,
+            maxsize=db_pool_max
+        )
+        await db.warm_up()
+
+    async def start_after(loop: Callable[[], Awaitable[None]], *stages: asyncio.Task) -> None:
+        await asyncio.gather(*stages)
+        await loop()
+
+    async def open_session(client) -> None:
+        await stack.enter_async_context(client)
+        await client.warm_up()
+
+    async def resume() -> None:
+        # Продолжаем работу со скинами, ожидавшими обработки перед прошлым перезапуском, если они еще актуальны,
+        # а уже обработанные скины не берем в очередь повторно
+        state = await journal.load()
+        if state:
+            await skin_mgr.restore(state, limit=engine.total_limit)
+            print(f"Из журнала восстановлено скинов: {sum(len(queue.pending) for queue in skin_mgr.queues.values())}")
+
+    # Сессии лисскинс и телеграм общие на все время работы и закрываются при выходе
+    async with AsyncExitStack() as stack:
+        # Этапы запуска идут параллельно, а каждый цикл стартует, как только готовы нужные ему этапы, не дожидаясь
+        # остальных: рассылке нужны сессия телеграм и журнал, а парсингу - бд и сессия лисскинс
+        db_ready = asyncio.create_task(timer.measure("подключение к MySQL и прогрев пула", connect_db()))
+        lis_ready = asyncio.create_task(timer.measure("сессия лисскинс", open_session(parser)))
+        tg_ready = asyncio.create_task(timer.measure("сессия телеграм", open_session(tg_bot)))
+        journal_ready = [asyncio.create_task(timer.measure("чтение журнала скинов", resume()))] if journal else []
+        stages = [db_ready, lis_ready, tg_ready, *journal_ready]
+
+        async def report_startup() -> None:
+            await asyncio.gather(*stages)
+            timer.report()
+
+        # Если задана таблица с продажами в Steam - считаем свежие средние цены по потоку продаж
+        sales_table = os.getenv("STEAM_SALES_TABLE")
+        stats = None
+        if sales_table:
+            from stats_module.stats_manager import CorridorStats
+            stats = CorridorStats(
+                catalog,
+                sales_table,
+                price_column=os.getenv("STEAM_SALES_PRICE_COLUMN", "price"),
+                time_column=os.getenv("STEAM_SALES_TIME_COLUMN", "sold_at")
+            )
+
+        dispatcher = TelegramDispatcher(tg_bot, load_chat_configs())
+
+        # Параллельно запускаем задачу парсинга скинов, раздачи скинов по чатам, отправки сообщений в чаты и
+        # подтягивания новых продаж Steam
+        await asyncio.gather(
+            report_startup(),
+            start_after(lambda: parsing_loop(db, skin_mgr, parser, engine, stats), db_ready, lis_ready),
+            start_after(lambda: sending_loop(dispatcher, skin_mgr, catalog, int(os.getenv("NOTIFY_CONSUMERS", "1")),
+                                             timer), tg_ready, *journal_ready),
+            start_after(dispatcher.run, tg_ready),
+            *([start_after(lambda: stats_loop(db, stats), db_ready)] if stats else []),
+            *([start_after(lambda: journal_loop(skin_mgr, journal), *journal_ready)] if journal else [])
+        )
 
 
 if __name__ == "__main__":
@@ -158,13 +278,16 @@ if __name__ == "__main__":
         telegram_bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
         telegram_chat_id = os.getenv("TELEGRAM_CHAT_ID")
 
-        # Создаем экземпляры классов телеграм бота, коннектора базы данных и менеджера скинов
+        # Создаем экземпляры классов телеграм бота, общего каталога предметов, коннектора базы данных и менеджера скинов
         telegram_bot = TelegramBot(telegram_bot_token, telegram_chat_id)
-        database = DatabaseModule()
-        skin_manager = SkinManager()
-
-        # Запускаем основную функцию main
-        asyncio.run(main(database, telegram_bot, skin_manager))
+        catalog_index = CatalogIndex()
+        database = DatabaseModule(catalog_index)
+        skin_manager = SkinManager(actions=("notify",))
+
+        # Записываем время импорта модулей и запускаем основную функцию main
+        startup_timer = StartupTimer(STARTED_AT)
+        startup_timer.record("импорт модулей", time.perf_counter() - STARTED_AT)
+        asyncio.run(main(database, telegram_bot, skin_manager, catalog_index, startup_timer))
 
     except KeyboardInterrupt:
         pass
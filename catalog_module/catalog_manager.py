@@ -0,0 +1,104 @@
+import urllib.parse
+from typing import Dict, List
+
+
+class CatalogIndex:
+    """
+    Класс каталога предметов: каждому имени предмета один раз выдается постоянный целочисленный id, а вместе с ним
+    заранее считаются раскодированное имя, слаг и ссылка на лисскинс и ссылка на Steam.
+
+    База данных, выгрузка лисскинс и сообщения работают с id из каталога, поэтому в каждом цикле парсинга не нужно
+    заново раскодировать имена и собирать ссылки.
+    """
+    LIS_URL = "https://lis-skins.com/ru/market/csgo/"
+    STEAM_URL = "https://steamcommunity.com/market/listings/730/"
+
+    def __init__(self):
+        """
+        Магический метод инициализации экземпляра класса.
+        """
+        self.ids: Dict[str, int] = {}
+        self.encoded_ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.slugs: List[str] = []
+        self.lis_urls: List[str] = []
+        self.steam_urls: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def make_slug(name: str) -> str:
+        """
+        Метод для получения слага предмета на лисскинс из его имени.
+
+        :param name: Раскодированное имя предмета.
+        :return: Слаг предмета для ссылки на лисскинс.
+        """
+        return (name.lower().replace(' | ', '-').replace(' ', '-')
+                .replace('(', '').replace(')', '').replace('™', ''))
+
+    def get_id(self, name: str) -> int:
+        """
+        Метод для получения id предмета по раскодированному имени, при первом обращении предмет добавляется в каталог.
+
+        :param name: Раскодированное имя предмета.
+        :return: Id предмета в каталоге.
+        """
+        name_id = self.ids.get(name)
+        if name_id is not None:
+            return name_id
+
+        name_id = len(self.names)
+        slug = self.make_slug(name)
+        self.ids[name] = name_id
+        self.names.append(name)
+        self.slugs.append(slug)
+        self.lis_urls.append(f"{self.LIS_URL}{slug}")
+        self.steam_urls.append(f"{self.STEAM_URL}{urllib.parse.quote(name)}")
+        return name_id
+
+    def get_id_encoded(self, encoded_name: str) -> int:
+        """
+        Метод для получения id предмета по закодированному в url имени, как оно хранится в базе данных.
+        Раскодирование делается только при первом обращении к этому имени.
+
+        :param encoded_name: Закодированное имя предмета.
+        :return: Id предмета в каталоге.
+        """
+        name_id = self.encoded_ids.get(encoded_name)
+        if name_id is None:
+            name_id = self.get_id(urllib.parse.unquote(encoded_name))
+            self.encoded_ids[encoded_name] = name_id
+        return name_id
+
+    def set_lis_url(self, name_id: int, url: str) -> None:
+        """
+        Метод для замены собранной по слагу ссылки на лисскинс ссылкой, которую отдал сам сайт.
+
+        :param name_id: Id предмета в каталоге.
+        :param url: Ссылка на предмет на лисскинс.
+        """
+        if url:
+            self.lis_urls[name_id] = url
+
+    def name(self, name_id: int) -> str:
+        """
+        :param name_id: Id предмета в каталоге.
+        :return: Раскодированное имя предмета.
+        """
+        return self.names[name_id]
+
+    def lis_url(self, name_id: int) -> str:
+        """
+        :param name_id: Id предмета в каталоге.
+        :return: Ссылка на предмет на лисскинс.
+        """
+        return self.lis_urls[name_id]
+
+    def steam_url(self, name_id: int) -> str:
+        """
+        :param name_id: Id предмета в каталоге.
+        :return: Ссылка на предмет на торговой площадке Steam.
+        """
+        return self.steam_urls[name_id]
@@ -1,35 +1,39 @@
 import aiomysql
+import asyncio
+from datetime import datetime
 from typing import Optional
-import urllib.parse
+
+from catalog_module.catalog_manager import CatalogIndex
 
 
 class DatabaseModule:
     """
     Класс для работы с базой данных MySQL.
     """
-    def __init__(self):
+    def __init__(self, catalog: Optional[CatalogIndex] = None):
         """
         Магический метод инициализации экземпляра класса.
+
+        :param catalog: Общий каталог предметов, по стандарту None - создается свой.
         """
         self.pool: Optional[aiomysql.Pool] = None
+        self.catalog = catalog if catalog is not None else CatalogIndex()
 
-    @staticmethod
-    async def _collect_rows(rows: dict) -> dict:
+    async def _collect_rows(self, rows: dict) -> dict:
         """
         Метод для сбора из полученных данных - данных для отправки.
         :param rows: Строки из бд
 
-        :return: Преобразованные строки из бд для дальнейшей работы
+        :return: Преобразованные строки из бд для дальнейшей работы в виде {id предмета в каталоге: {...}}
         """
+        get_id_encoded = self.catalog.get_id_encoded
         db_items = {}
         for row in rows:
-            item_name_encoded = row["item_name"]
-            corridor_avg = row["corridor_avg"]
-            decoded_name = urllib.parse.unquote(item_name_encoded)
-            db_items[decoded_name] = {"corridor_avg": corridor_avg}
+            db_items[get_id_encoded(row["item_name"])] = {"corridor_avg": row["corridor_avg"]}
         return db_items
 
-    async def connect(self, host: str, port: int, user: str, password: str, db: str) -> None:
+    async def connect(self, host: str, port: int, user: str, password: str, db: str, minsize: int = 1,
+                      maxsize: int = 10) -> None:
         """
         Метод для установки ассинхронного соединения с базой данных уже после создания экземпляра класса.
 
@@ -38,6 +42,8 @@ class DatabaseModule:
         :param user: Имя пользователя в базе данных, для локальной бд по стандарту: root
         :param password: Пароль для подключения к субд, задается пользователем при установке субд
         :param db: Имя базы данных
+        :param minsize: Сколько соединений пул открывает сразу и держит открытыми, по стандарту 1
+        :param maxsize: Максимальное количество соединений в пуле, по стандарту 10
         """
         try:
             self.pool = await aiomysql.create_pool(
@@ -46,6 +52,8 @@ class DatabaseModule:
                 user=user,
                 password=password,
                 db=db,
+                minsize=minsize,
+                maxsize=maxsize,
                 autocommit=True,  # Ставим автокоммит для ускорения ответа и запросов
                 echo=False,  # Отключаем логирование для ускорения
             )
@@ -54,10 +62,24 @@ class DatabaseModule:
             print(f"При подключении к MySQL произошла ошибка: {e}")
             raise
 
-    async def load_items(self, table_name: str = "cs2_sales_data_2025_02_03") -> dict:
+    async def warm_up(self) -> None:
+        """
+        Метод для прогрева пула: параллельно делает простой запрос через каждое из minsize соединений, чтобы первый
+        настоящий запрос не тратил время на проверку соединения.
+        """
+        async def ping() -> None:
+            async with self.pool.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute("SELECT 1")
+                    await cur.fetchone()
+
+        await asyncio.gather(*(ping() for _ in range(self.pool.minsize)))
+
+    async def load_items(self, table_name: str = "cs2_sales_data_2025_02_03", min_corridor_avg: float = 0.1) -> dict:
         """
         Метод получения всех скинов из указанной таблицы по заданному запросу.
         :param table_name: Имя таблицы, откуда хотим получить данные, по стандарту стоит cs2_sales_data_2025_02_03, но надо бы исправить!!!
+        :param min_corridor_avg: Минимальная средняя цена продажи, скины дешевле не загружаются.
         :return: Полученные и преобразованные строки из базы
         """
         # Задаем запрос для поиска подходящих скинов, если нужно, то можно будет его потом отредактировать или
@@ -65,7 +87,7 @@ class DatabaseModule:
         query = f"""
                 SELECT item_name, corridor_avg
                 FROM {table_name}
-                WHERE corridor_avg > 0.1
+                WHERE corridor_avg > %s
             """
 
         # Ассинхронно из нашего подключения открываем коннектор и из него курсор и делаем запрос
@@ -73,7 +95,7 @@ class DatabaseModule:
             async with conn.cursor(aiomysql.DictCursor) as cur:
 
                 try:
-                    await cur.execute(query)
+                    await cur.execute(query, (min_corridor_avg,))
                     rows = await cur.fetchall()
                     db_items = await self._collect_rows(rows)
 
@@ -83,6 +105,64 @@ class DatabaseModule:
                     print(f"Ошибка при выполнении запроса к таблице из бд: {e}")
                     raise
 
+    async def get_first_sale_id(self, table_name: str, since_time: datetime, time_column: str = "sold_at") -> int:
+        """
+        Метод получения id первой продажи, совершенной не раньше указанного времени.
+        :param table_name: Имя таблицы с продажами.
+        :param since_time: Время, начиная с которого нужны продажи.
+        :param time_column: Колонка со временем продажи.
+        :return: Id первой такой продажи, либо id, следующий за последним, если таких продаж нет
+        """
+        query = f"""
+                SELECT COALESCE(MIN(id), (SELECT COALESCE(MAX(id), 0) + 1 FROM {table_name}))
+                FROM {table_name}
+                WHERE {time_column} >= %s
+            """
+
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cur:
+
+                try:
+                    await cur.execute(query, (since_time,))
+                    row = await cur.fetchone()
+
+                    return int(row[0])
+
+                except Exception as e:
+                    print(f"Ошибка при выполнении запроса к таблице из бд: {e}")
+                    raise
+
+    async def load_sales(self, table_name: str, since_id: int = 0, limit: int = 10000, price_column: str = "price",
+                         time_column: str = "sold_at") -> list:
+        """
+        Метод получения продаж в Steam, добавленных в таблицу после продажи с указанным id.
+        :param table_name: Имя таблицы с продажами, в ней должна быть автоинкрементная колонка id.
+        :param since_id: Id последней уже полученной продажи.
+        :param limit: Максимальное количество продаж за один запрос.
+        :param price_column: Колонка с ценой продажи.
+        :param time_column: Колонка со временем продажи.
+        :return: Строки вида {"id": ..., "item_name": ..., "price": ..., "sold_at": ...}, отсортированные по id
+        """
+        query = f"""
+                SELECT id, item_name, {price_column} AS price, {time_column} AS sold_at
+                FROM {table_name}
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+            """
+
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+
+                try:
+                    await cur.execute(query, (since_id, limit))
+
+                    return list(await cur.fetchall())
+
+                except Exception as e:
+                    print(f"Ошибка при выполнении запроса к таблице из бд: {e}")
+                    raise
+
 
 
 async def main():
@@ -112,7 +192,6 @@ async def main():
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
 
 
@@ -1,6 +1,12 @@
 import aiohttp
+import asyncio
+import gzip
+import json
+import os
 from typing import Optional, List
 
+from catalog_module.catalog_manager import CatalogIndex
+
 
 class LisskinsAPIModule:
     """
@@ -11,7 +17,8 @@ class LisskinsAPIModule:
 
     P.S. Подробнее про API можно прочитать тут: https://lis-skins-ru.stoplight.io/docs/lis-skins-ru-public-user-api/
     """
-    def __init__(self, api_token: str):
+    def __init__(self, api_token: str, catalog: Optional[CatalogIndex] = None, snapshot_dir: Optional[str] = None,
+                 snapshot_compression: str = "zstd"):
         """
         Магический метод инициализации экземпляра класса, принимает API ключ.
 
@@ -24,75 +31,163 @@ class LisskinsAPIModule:
         BUY_URL - url API для покупки скина.
 
         :param api_token: Ключ доступа к API сайта lis-skins.
+        :param catalog: Общий каталог предметов, по стандарту None - создается свой.
+        :param snapshot_dir: Папка для сохранения снапшотов выгрузки на диск. По стандарту None - снапшоты не сохраняются.
+        :param snapshot_compression: Сжатие снапшотов на диске: "zstd", "gzip" или "none". Пакет zstandard не
+        обязателен, если он не установлен, вместо "zstd" используется "gzip".
         """
         if not api_token:
             raise ValueError("API ключ не задан")
 
+        if snapshot_compression not in ("zstd", "gzip", "none"):
+            raise ValueError(f"Неизвестный тип сжатия снапшотов: {snapshot_compression}")
+
         self.JSON_URL_SHORT = "https://lis-skins.com/market_export_json/csgo.json"
         self.JSON_URL_LONG = "https://lis-skins.com/market_export_json/api_csgo_unlocked.json"
         self.BUY_URL = "https://api.lis-skins.com/v1/market/buy"
 
         self.api_token = api_token #!
         self.session = None
+        self.catalog = catalog if catalog is not None else CatalogIndex()
+
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_compression = snapshot_compression
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(
-            headers={"Authorization": f"Bearer {self.api_token}"}
-        )
+        # Сжатие ответа (gzip, deflate, а при установленном Brotli еще и br) aiohttp запрашивает и распаковывает сам
+        self.session = aiohttp.ClientSession(headers={"Authorization": f"Bearer {self.api_token}"})
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
 
-    @staticmethod
-    async def _collect_data_for_short_request(all_items: Optional[dict]) -> dict:
+    async def _collect_data_for_short_request(self, all_items: Optional[dict]) -> dict:
         """
         Метод для структурирования и сбора всей информации о скинах с парсинга сайта.
+        Ссылки на предметы, которые отдает сайт, сохраняются в каталог.
 
         :param all_items: Все предметы, которые спарсили с сайта лисскинс.
-        :return: Преобразованный словарь с парсинга в словарь вида {"name": "...", "price": "..."}.
+        :return: Преобразованный словарь с парсинга в словарь вида {id предмета в каталоге: {"min_price": ...}}.
         """
+        get_id = self.catalog.get_id
         lis_items = {}
         for item in all_items:
-            name = item.get("name", "")
+            name_id = get_id(item.get("name", ""))
             price = item.get("price", 0.0)
-            url = item.get("url", "")
 
-            if name not in lis_items:
-                lis_items[name] = {
-                    "url": url,
+            if name_id not in lis_items:
+                self.catalog.set_lis_url(name_id, item.get("url", ""))
+                lis_items[name_id] = {
                     "min_price": price,
                 }
             else:
-                if price < lis_items[name]["min_price"]:
-                    lis_items[name]["min_price"] = price
+                if price < lis_items[name_id]["min_price"]:
+                    lis_items[name_id]["min_price"] = price
         return lis_items
 
-    @staticmethod
-    async def _collect_data_for_long_request(all_items: Optional[dict]) -> dict:
+    async def _collect_data_for_long_request(self, all_items: Optional[dict]) -> dict:
         """
         Метод для структурирования и сбора всей информации о скинах с парсинга сайта.
 
         :param all_items: Все предметы, которые спарсили с сайта лисскинс.
-        :return: Преобразованный словарь с парсинга в словарь вида {"name": "...", "price": "..."}.
+        :return: Преобразованный словарь с парсинга в словарь вида {id предмета в каталоге: {"item_id": ...,
+        "min_price": ...}}, где item_id - id самого дешевого лота этого предмета.
         """
+        get_id = self.catalog.get_id
         lis_items = {}
         for items in all_items["items"]:
-            name = items["name"]
+            name_id = get_id(items["name"])
             item_id = items["id"]
             price = items["price"]
 
-            if name not in lis_items:
-                lis_items[name] = {
+            if name_id not in lis_items:
+                lis_items[name_id] = {
                     "item_id": item_id,
                     "min_price": price,
                 }
             else:
-                if price < lis_items[name]["min_price"]:
-                    lis_items[name]["min_price"] = price
+                if price < lis_items[name_id]["min_price"]:
+                    lis_items[name_id]["item_id"] = item_id
+                    lis_items[name_id]["min_price"] = price
         return lis_items
 
+    async def _warm_up_url(self, url: str) -> None:
+        try:
+            async with self.session.head(url=url) as response:
+                await response.release()
+        except Exception as e:
+            print(f"Не удалось заранее подключиться к {url}: {e}")
+
+    async def warm_up(self, buying: bool = False) -> None:
+        """
+        Метод для заблаговременной установки соединения с сайтом: HEAD запрос открывает TCP и TLS соединение, которое
+        потом переиспользуют парсинг и покупки. Ошибки не критичны и только выводятся.
+
+        :param buying: Прогреть также соединение с API покупок, оно на другом хосте (api.lis-skins.com).
+        """
+        urls = [self.JSON_URL_LONG, self.BUY_URL] if buying else [self.JSON_URL_LONG]
+        await asyncio.gather(*(self._warm_up_url(url) for url in urls))
+
+    async def _read_json(self, response: aiohttp.ClientResponse, snapshot_name: str) -> dict:
+        """
+        Метод для чтения выгрузки: распакованное aiohttp тело разбирается как json и, если задан snapshot_dir,
+        сохраняется на диск. Снапшот не обязателен, поэтому ошибка его записи только выводится и не прерывает парсинг.
+
+        :param response: Ответ сервера на запрос выгрузки.
+        :param snapshot_name: Имя снапшота, под которым сохранить выгрузку на диск.
+        :return: Разобранный json из ответа.
+        """
+        body = await response.read()
+        data = json.loads(body)
+
+        if self.snapshot_dir:
+            try:
+                await asyncio.to_thread(self._save_snapshot, snapshot_name, body)
+            except Exception as e:
+                print(f"Ошибка при сохранении снапшота выгрузки лисскинс: {e}")
+
+        return data
+
+    def _snapshot_path(self, snapshot_name: str, compression: str) -> str:
+        """
+        Метод для получения пути к файлу снапшота.
+
+        :param snapshot_name: Имя снапшота.
+        :param compression: Сжатие снапшота: "zstd", "gzip" или "none".
+        :return: Путь к файлу снапшота.
+        """
+        extension = {"zstd": ".json.zst", "gzip": ".json.gz", "none": ".json"}[compression]
+        return os.path.join(self.snapshot_dir, f"{snapshot_name}{extension}")
+
+    def _save_snapshot(self, snapshot_name: str, body: bytes) -> None:
+        """
+        Метод для сохранения выгрузки на диск в сжатом виде. Сначала пишем во временный файл, а потом подменяем
+        старый снапшот, чтобы при падении посреди записи не остаться с битым файлом.
+
+        :param snapshot_name: Имя снапшота.
+        :param body: Распакованное тело ответа.
+        """
+        compression = self.snapshot_compression
+        if compression == "zstd":
+            # zstandard нужен только для снапшотов, поэтому импортируется лишь при их сохранении
+            try:
+                import zstandard
+                payload = zstandard.ZstdCompressor(level=3).compress(body)
+            except ImportError:
+                compression = "gzip"
+
+        if compression == "gzip":
+            payload = gzip.compress(body, compresslevel=5)
+        elif compression == "none":
+            payload = body
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._snapshot_path(snapshot_name, compression)
+        with open(f"{path}.tmp", "wb") as file:
+            file.write(payload)
+        os.replace(f"{path}.tmp", path)
+
     async def parse_with_json_request(self) -> dict:
         """
         Метод для парсинга всех скинов с сайта лисскинс через json запрос по API.
@@ -103,7 +198,7 @@ class LisskinsAPIModule:
         async with self.session.get(url=self.JSON_URL_SHORT) as response:
             try:
                 response.raise_for_status()
-                resp = await response.json()
+                resp = await self._read_json(response, "csgo")
                 data = await self._collect_data_for_short_request(resp)
                 return data
 
@@ -121,7 +216,7 @@ class LisskinsAPIModule:
         async with self.session.get(url=self.JSON_URL_LONG) as response:
             try:
                 response.raise_for_status()
-                resp = await response.json()
+                resp = await self._read_json(response, "api_csgo_unlocked")
                 data = await self._collect_data_for_long_request(resp)
                 return data
 
@@ -1,42 +1,82 @@
-import asyncio
-import random
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional
+
+from skin_module.work_queue import WorkQueue
 
 
 class SkinManager:
     """
     Класс для работы со скинами.
+
+    Для каждого действия над скинами (например покупка или отправка в чат) заводится своя очередь WorkQueue,
+    после парсинга выгодные скины раздаются во все очереди, а разбирают их параллельные потребители.
     """
 
-    def __init__(self):
+    def __init__(self, actions: Iterable[str] = ("notify",), capacity: int = 500, item_ttl: float = 300.0,
+                 lease_timeout: float = 60.0):
         """
         Магический метод инициализации экземпляра класса.
+
+        :param actions: Названия действий, для каждого создается своя очередь.
+        :param capacity: Сколько скинов одновременно может ждать обработки в каждой очереди, по стандарту 500.
+        :param item_ttl: Сколько секунд скин после парсинга считается актуальным.
+        :param lease_timeout: Сколько секунд потребитель может обрабатывать один скин.
+        """
+        self.item_ttl = item_ttl
+        self.queues: Dict[str, WorkQueue] = {
+            action: WorkQueue(capacity=capacity, lease_timeout=lease_timeout, item_ttl=item_ttl)
+            for action in actions
+        }
+
+    @property
+    def version(self) -> int:
+        """
+        Номер изменения очередей, растет после каждого добавления, подтверждения и возврата скина.
         """
-        self.current_skins: List[Dict] = []
-        self.lock = asyncio.Lock()
+        return sum(queue.version for queue in self.queues.values())
 
-    async def update_skins(self, new_skins: List[Dict]) -> None:
+    @property
+    def saturated(self) -> bool:
         """
-        Метод для обновления топ 500 самых выгодных скинов после парсинга.
+        True, если во всех очередях нет места и потребители не успевают разбирать скины.
         """
-        async with self.lock:
-            # Объединяем старые и новые скины
-            combined_skins = self.current_skins + new_skins
+        return all(queue.saturated for queue in self.queues.values())
 
-            # Сортируем по убыванию прибыли и берем топ 500 самых выгодных
-            combined_skins.sort(key=lambda x: x["profit_perc"], reverse=True)
-            self.current_skins = combined_skins[:500]
+    async def update_skins(self, new_skins: List[Dict], limit: Optional[int] = None,
+                           ttl: Optional[float] = None) -> None:
+        """
+        Метод для раздачи самых выгодных скинов после парсинга во все очереди.
+
+        :param new_skins: Новые выгодные скины после парсинга.
+        :param limit: Сколько самых выгодных скинов может ждать обработки в каждой очереди. По стандарту None -
+        вместимость, заданная при инициализации.
+        :param ttl: Сколько секунд эти скины актуальны. По стандарту None - item_ttl, заданный при инициализации.
+        """
+        for queue in self.queues.values():
+            if limit is not None:
+                queue.capacity = limit
+            await queue.put_many(new_skins, ttl=ttl)
 
-            # Перемешиваем скины в случайном порядке
-            random.shuffle(self.current_skins)
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Метод получения состояния всех очередей для сохранения на диск.
+
+        :return: Словарь {действие: состояние очереди из WorkQueue.snapshot}.
+        """
+        return {action: queue.snapshot() for action, queue in self.queues.items()}
 
-    async def get_skin_to_send(self) -> Dict | None:
+    async def restore(self, state: Dict[str, Dict], limit: Optional[int] = None) -> None:
         """
-        Метод итерации по списку, возврата и удаление первого в списке скина из текущего списка.
+        Метод восстановления очередей из состояния, сохраненного методом snapshot. Действия, для которых в
+        SkinManager нет очереди, пропускаются.
 
-        :return: Возвращает либо первый в списке скин и удаляет его из списка, либо None, если список пуст
+        :param state: Словарь {действие: {"pending": [...], "done": {...}}}.
+        :param limit: Сколько самых выгодных скинов может ждать обработки в каждой очереди. По стандарту None -
+        вместимость, заданная при инициализации.
         """
-        async with self.lock:
-            if not self.current_skins:
-                return None
-            return self.current_skins.pop(0)
+        for action, queue_state in state.items():
+            queue = self.queues.get(action)
+            if queue is None:
+                continue
+            if limit is not None:
+                queue.capacity = limit
+            await queue.restore(queue_state["pending"], queue_state["done"])
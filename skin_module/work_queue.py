@@ -0,0 +1,304 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class Lease:
+    """
+    Класс выданного потребителю скина. Пока срок аренды не истек, этот скин не выдается никому другому.
+    """
+
+    def __init__(self, token: int, key: Hashable, skin: Dict, deadline: float, expires_at: float):
+        """
+        Магический метод инициализации экземпляра класса.
+
+        :param token: Уникальный номер аренды.
+        :param key: Ключ скина в очереди.
+        :param skin: Словарь с информацией о скине.
+        :param deadline: Время, после которого аренда считается брошенной и скин возвращается в очередь.
+        :param expires_at: Время, после которого скин считается устаревшим.
+        """
+        self.token = token
+        self.key = key
+        self.skin = skin
+        self.deadline = deadline
+        self.expires_at = expires_at
+
+
+class WorkQueue:
+    """
+    Класс ограниченной очереди скинов для нескольких параллельных потребителей одного действия (покупка, отправка).
+
+    Скины выдаются в аренду по убыванию оценки, одновременно скин держит только один потребитель: пока он в
+    аренде или уже обработан, повторно он в очередь не попадает. Устаревшие скины выбрасываются до выдачи, а
+    брошенные аренды (потребитель завис или упал) возвращаются в очередь, поэтому без подтверждения до начала
+    обработки скин может быть обработан повторно.
+    """
+
+    def __init__(self, capacity: int = 500, lease_timeout: float = 60.0, item_ttl: float = 300.0,
+                 key_field: str = "name_id", max_lag: float = 60.0, high_water: float = 0.5):
+        """
+        Магический метод инициализации экземпляра класса.
+
+        :param capacity: Сколько скинов одновременно может быть в очереди и в аренде.
+        :param lease_timeout: Сколько секунд потребитель может держать скин в аренде.
+        :param item_ttl: Сколько секунд скин считается актуальным после парсинга, столько же обработанный скин не
+        принимается в очередь повторно.
+        :param key_field: Поле скина, по которому скины отличаются друг от друга.
+        :param max_lag: Сколько секунд скин может ждать выдачи, прежде чем считается, что потребители отстают.
+        :param high_water: Доля вместимости очереди: если столько скинов ждут выдачи дольше max_lag, очередь
+        считается переполненной.
+        """
+        self.capacity = capacity
+        self.lease_timeout = lease_timeout
+        self.item_ttl = item_ttl
+        self.key_field = key_field
+        self.max_lag = max_lag
+        self.high_water = high_water
+
+        self.pending: Dict[Hashable, Dict] = {}
+        self.expires: Dict[Hashable, float] = {}
+        self.enqueued_at: Dict[Hashable, float] = {}
+        self.heap: List[tuple] = []
+        self.leases: Dict[int, Lease] = {}
+        self.leased_keys: set = set()
+        self.done: Dict[Hashable, float] = {}
+        self.counter = itertools.count()
+        self.version = 0
+        self.lock = asyncio.Lock()
+        self.changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self.pending) + len(self.leases)
+
+    @property
+    def saturated(self) -> bool:
+        """
+        True, если потребители не успевают разбирать скины: не меньше high_water от вместимости очереди
+        актуальных скинов ждут выдачи дольше max_lag. Только что добавленные парсингом скины не учитываются,
+        поэтому заполненная парсингом очередь сама по себе переполненной не считается.
+        """
+        now = time.monotonic()
+        # Все изменения очереди под блокировкой идут без await, поэтому очистку можно делать и без нее
+        self._expire(now)
+        lagging = sum(1 for enqueued_at in self.enqueued_at.values() if now - enqueued_at >= self.max_lag)
+        return lagging >= max(1, int(self.capacity * self.high_water))
+
+    @staticmethod
+    def _score(skin: Dict) -> float:
+        return skin.get("score", skin["profit_perc"])
+
+    def _push(self, key: Hashable, skin: Dict, expires_at: float) -> None:
+        self.pending[key] = skin
+        self.expires[key] = expires_at
+        # При обновлении уже ожидающего скина свежими данными время ожидания не сбрасывается
+        self.enqueued_at.setdefault(key, time.monotonic())
+        heapq.heappush(self.heap, (-self._score(skin), next(self.counter), key, skin))
+
+    def _discard(self, key: Hashable) -> None:
+        del self.pending[key]
+        del self.expires[key]
+        del self.enqueued_at[key]
+
+    def _expire(self, now: float) -> None:
+        """
+        Метод очистки очереди: выбрасывает устаревшие скины, возвращает в очередь скины из брошенных аренд и
+        забывает обработанные скины, у которых прошел item_ttl.
+
+        :param now: Текущее время.
+        """
+        for key in [key for key, expires_at in self.expires.items() if expires_at <= now]:
+            self._discard(key)
+
+        for lease in [lease for lease in self.leases.values() if lease.deadline <= now]:
+            del self.leases[lease.token]
+            self.leased_keys.discard(lease.key)
+            if lease.expires_at > now and lease.key not in self.pending:
+                self._push(lease.key, lease.skin, lease.expires_at)
+
+        for key in [key for key, until in self.done.items() if until <= now]:
+            del self.done[key]
+
+        # Перестраиваем кучу, когда в ней накопилось слишком много записей об уже выданных или выброшенных скинах
+        if len(self.heap) > 2 * len(self.pending) + 64:
+            self.heap = [entry for entry in self.heap if self.pending.get(entry[2]) is entry[3]]
+            heapq.heapify(self.heap)
+
+    def _trim(self) -> None:
+        """
+        Метод выбрасывания скинов с наименьшей оценкой, если очередь переполнена.
+        """
+        overflow = len(self) - self.capacity
+        if overflow > 0:
+            for key, _ in heapq.nsmallest(overflow, self.pending.items(), key=lambda x: self._score(x[1])):
+                self._discard(key)
+
+    def snapshot(self) -> Dict:
+        """
+        Метод получения состояния очереди для сохранения на диск. Скины в аренде считаются ожидающими, а
+        обработанные скины сохраняются отдельно, чтобы после перезапуска не обработать их повторно.
+
+        :return: Словарь {"pending": [(скин, сколько секунд он еще актуален), ...], "done": {ключ скина: сколько
+        секунд он еще не принимается в очередь повторно}}.
+        """
+        now = time.monotonic()
+        pending = [(skin, self.expires[key] - now) for key, skin in self.pending.items() if self.expires[key] > now]
+        pending.extend((lease.skin, lease.expires_at - now) for lease in self.leases.values()
+                       if lease.expires_at > now)
+        done = {key: until - now for key, until in self.done.items() if until > now}
+        return {"pending": pending, "done": done}
+
+    async def restore(self, pending: List[Tuple[Dict, float]], done: Dict[Hashable, float]) -> None:
+        """
+        Метод восстановления состояния очереди, сохраненного методом snapshot.
+
+        :param pending: Список пар (скин, сколько секунд он еще актуален).
+        :param done: Словарь {ключ скина: сколько секунд он еще не принимается в очередь повторно}.
+        """
+        async with self.lock:
+            now = time.monotonic()
+            for key, ttl in done.items():
+                if ttl > 0:
+                    self.done[key] = max(self.done.get(key, 0.0), now + ttl)
+
+            for skin, ttl in pending:
+                key = skin[self.key_field]
+                if ttl <= 0 or key in self.leased_keys or key in self.done or key in self.pending:
+                    continue
+                self._push(key, skin, now + ttl)
+
+            self._trim()
+            self.version += 1
+            self.changed.set()
+
+    async def put_many(self, skins: List[Dict], ttl: Optional[float] = None) -> None:
+        """
+        Метод добавления скинов после парсинга. Уже лежащие в очереди скины заменяются свежими данными, а если
+        очередь переполнена, из нее выбрасываются скины с наименьшей оценкой.
+
+        :param skins: Список словарей с информацией о скинах.
+        :param ttl: Сколько секунд эти скины актуальны. По стандарту None - item_ttl.
+        """
+        async with self.lock:
+            now = time.monotonic()
+            self._expire(now)
+
+            for skin in skins:
+                key = skin[self.key_field]
+                if key in self.leased_keys or key in self.done:
+                    continue
+                self._push(key, skin, now + (ttl if ttl is not None else self.item_ttl))
+
+            self._trim()
+            self.version += 1
+            self.changed.set()
+
+    async def lease(self) -> Lease:
+        """
+        Метод получения в аренду самого выгодного актуального скина, ждет, пока такой скин появится.
+
+        :return: Экземпляр класса Lease с выданным скином.
+        """
+        while True:
+            async with self.lock:
+                now = time.monotonic()
+                self._expire(now)
+
+                while self.heap:
+                    _, _, key, skin = heapq.heappop(self.heap)
+                    if self.pending.get(key) is not skin:
+                        continue
+
+                    expires_at = self.expires[key]
+                    self._discard(key)
+                    lease = Lease(next(self.counter), key, skin, now + self.lease_timeout, expires_at)
+                    self.leases[lease.token] = lease
+                    self.leased_keys.add(key)
+                    return lease
+
+                self.changed.clear()
+
+            # Ждем новых скинов, но не дольше секунды, чтобы вовремя вернуть скины из брошенных аренд
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    async def ack(self, lease: Lease) -> bool:
+        """
+        Метод подтверждения, что скин обработан.
+
+        :param lease: Аренда скина.
+        :return: False, если аренда уже истекла и скин был возвращен в очередь.
+        """
+        async with self.lock:
+            if self.leases.pop(lease.token, None) is None:
+                return False
+            self.leased_keys.discard(lease.key)
+            self.done[lease.key] = time.monotonic() + self.item_ttl
+            self.version += 1
+            return True
+
+    async def release(self, lease: Lease) -> None:
+        """
+        Метод возврата необработанного скина в очередь, чтобы его забрал другой потребитель.
+
+        :param lease: Аренда скина.
+        """
+        async with self.lock:
+            if self.leases.pop(lease.token, None) is None:
+                return
+            self.leased_keys.discard(lease.key)
+            if lease.expires_at > time.monotonic() and lease.key not in self.pending:
+                self._push(lease.key, lease.skin, lease.expires_at)
+                self.version += 1
+                self.changed.set()
+
+
+async def run_consumers(queue: WorkQueue, handler: Callable[[Dict], Awaitable[None]], concurrency: int = 1,
+                        pause: float = 0.0, at_most_once: bool = False) -> None:
+    """
+    Функция для запуска нескольких параллельных потребителей очереди.
+
+    По стандарту, если обработка скина упала или не уложилась в срок аренды, она прерывается, а скин
+    возвращается в очередь для другого потребителя, поэтому один медленный запрос не задерживает остальные скины.
+    Это подходит только для действий, которые можно безопасно повторить.
+
+    Для действий, которые нельзя повторять (покупка: запрос мог пройти на сервере, даже если ответ не дошел),
+    нужен at_most_once=True: скин подтверждается до начала обработки, обработка не прерывается по сроку аренды, а
+    при ошибке скин в очередь не возвращается.
+
+    :param queue: Очередь скинов.
+    :param handler: Асинхронная функция обработки одного скина.
+    :param concurrency: Количество параллельных потребителей.
+    :param pause: Пауза каждого потребителя после обработки скина в секундах.
+    :param at_most_once: Обрабатывать каждый скин не больше одного раза, без повторов. По стандарту False.
+    """
+    async def consumer() -> None:
+        while True:
+            lease = await queue.lease()
+
+            if at_most_once:
+                # Подтверждаем скин до обработки, чтобы он не вернулся в очередь, даже если обработка зависнет
+                if await queue.ack(lease):
+                    try:
+                        await handler(lease.skin)
+                    except Exception as e:
+                        print(f"Ошибка при обработке скина {lease.skin.get('item_name')}: {e!r}")
+            else:
+                # Прерываем обработку не позже окончания аренды, чтобы скин не получил другой потребитель, пока
+                # этот еще его обрабатывает
+                try:
+                    await asyncio.wait_for(handler(lease.skin), timeout=max(lease.deadline - time.monotonic(), 0.0))
+                except Exception as e:
+                    print(f"Ошибка при обработке скина {lease.skin.get('item_name')}: {e!r}")
+                    await queue.release(lease)
+                else:
+                    await queue.ack(lease)
+
+            if pause:
+                await asyncio.sleep(pause)
+
+    await asyncio.gather(*(consumer() for _ in range(concurrency)))
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, List, Dict, Optional, Tuple
+
+from catalog_module.catalog_manager import CatalogIndex
+
+
+class StartupTimer:
+    """
+    Класс для замера времени запуска бота по этапам.
+    """
+
+    def __init__(self, started_at: Optional[float] = None):
+        """
+        Магический метод инициализации экземпляра класса.
+
+        :param started_at: Время старта процесса по time.perf_counter(). По стандарту None - момент создания таймера.
+        """
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+        self.first_action_done = False
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Метод для записи длительности уже завершенного этапа.
+
+        :param name: Название этапа.
+        :param seconds: Длительность этапа в секундах.
+        """
+        self.stages.append((name, seconds))
+
+    async def measure(self, name: str, coro: Awaitable):
+        """
+        Метод для замера длительности этапа. Этапы можно замерять параллельно через asyncio.gather.
+
+        :param name: Название этапа.
+        :param coro: Корутина этапа.
+        :return: Результат корутины.
+        """
+        started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def report(self) -> None:
+        """
+        Метод вывода времени каждого этапа и общего времени запуска.
+        """
+        print("Время запуска:")
+        for name, seconds in self.stages:
+            print(f"  {name}: {seconds:.3f} с")
+        print(f"  всего с момента старта: {time.perf_counter() - self.started_at:.3f} с")
+
+    def first_action(self) -> None:
+        """
+        Метод для вывода времени от старта до первого обработанного скина, срабатывает только один раз.
+        """
+        if not self.first_action_done:
+            self.first_action_done = True
+            print(f"Первый скин обработан через {time.perf_counter() - self.started_at:.3f} с после старта")
+
+
+class SkinJournal:
+    """
+    Класс журнала очередей скинов на диске: ожидающие обработки скины и уже обработанные скины. По нему бот после
+    перезапуска сразу продолжает работу, не дожидаясь первого парсинга, и не обрабатывает повторно скины, которые
+    уже были отправлены или куплены.
+    """
+
+    def __init__(self, path: str, catalog: CatalogIndex):
+        """
+        Магический метод инициализации экземпляра класса.
+
+        :param path: Путь к файлу журнала.
+        :param catalog: Общий каталог предметов. Id предметов в каталоге отличаются от запуска к запуску, поэтому в
+        журнал пишутся имена предметов.
+        """
+        self.path = path
+        self.catalog = catalog
+        self.lock = asyncio.Lock()
+
+    def _write(self, journal: Dict) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Сначала пишем во временный файл, а потом подменяем журнал, чтобы при падении не остаться с битым файлом
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(journal, file, ensure_ascii=False)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def _read(self) -> Optional[Dict]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    async def save(self, state: Dict[str, Dict]) -> None:
+        """
+        Метод сохранения состояния очередей в журнал.
+
+        :param state: Состояние очередей из SkinManager.snapshot.
+        """
+        name = self.catalog.name
+        journal = {
+            "saved_at": time.time(),
+            "queues": {
+                action: {
+                    "pending": [{"skin": skin, "ttl": ttl} for skin, ttl in queue_state["pending"]],
+                    "done": {name(name_id): ttl for name_id, ttl in queue_state["done"].items()},
+                }
+                for action, queue_state in state.items()
+            }
+        }
+
+        try:
+            async with self.lock:
+                await asyncio.to_thread(self._write, journal)
+        except Exception as e:
+            print(f"Ошибка при сохранении журнала скинов: {e}")
+
+    async def load(self) -> Dict[str, Dict]:
+        """
+        Метод чтения состояния очередей из журнала. Время, прошедшее с сохранения журнала, вычитается из сроков
+        актуальности скинов, а id предметов заново выдаются по имени предмета.
+
+        :return: Состояние очередей для SkinManager.restore, либо пустой словарь, если журнала нет.
+        """
+        try:
+            journal = await asyncio.to_thread(self._read)
+        except Exception as e:
+            print(f"Ошибка при чтении журнала скинов: {e}")
+            return {}
+
+        if journal is None:
+            return {}
+
+        elapsed = time.time() - journal["saved_at"]
+        get_id = self.catalog.get_id
+        state = {}
+        for action, queue_state in journal.get("queues", {}).items():
+            pending = []
+            for entry in queue_state["pending"]:
+                if entry["ttl"] > elapsed:
+                    skin = entry["skin"]
+                    skin["name_id"] = get_id(skin["item_name"])
+                    pending.append((skin, entry["ttl"] - elapsed))
+
+            done = {get_id(item_name): ttl - elapsed for item_name, ttl in queue_state["done"].items()
+                    if ttl > elapsed}
+            state[action] = {"pending": pending, "done": done}
+        return state
@@ -0,0 +1,238 @@
+import bisect
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from catalog_module.catalog_manager import CatalogIndex
+
+
+class ItemWindow:
+    """
+    Класс скользящего окна продаж одного предмета в Steam.
+
+    Продажи хранятся в порядке поступления (для вытеснения старых) и в отсортированном по цене списке (для медианы
+    и усеченного среднего). Поиск позиции в отсортированном списке - бинарный, но вставка и удаление сдвигают
+    элементы списка, поэтому стоят O(n) от размера окна. Окно ограничено max_samples, и на таких размерах сдвиг
+    списка быстрее деревьев на чистом питоне. Сумма цен ведется на лету, а посчитанное усеченное среднее кешируется
+    до следующего изменения окна.
+    """
+
+    def __init__(self, window: float, max_samples: int, trim: float):
+        """
+        Магический метод инициализации экземпляра класса.
+
+        :param window: Длина окна в секундах.
+        :param max_samples: Максимальное количество продаж в окне.
+        :param trim: Доля самых дешевых и самых дорогих продаж, которые отбрасываются при подсчете среднего.
+        """
+        self.window = window
+        self.max_samples = max_samples
+        self.trim = trim
+
+        self.sales: deque = deque()
+        self.prices: List[float] = []
+        self.total = 0.0
+        self.newest = 0.0
+        self._trimmed_mean: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.sales)
+
+    def _remove_oldest(self) -> None:
+        """
+        Метод удаления самой старой продажи из окна.
+        """
+        _, price = self.sales.popleft()
+        del self.prices[bisect.bisect_left(self.prices, price)]
+        self.total -= price
+
+    def evict(self, now: float) -> None:
+        """
+        Метод вытеснения продаж, вышедших за окно по времени или по количеству.
+
+        :param now: Текущее время в секундах.
+        """
+        border = now - self.window
+        changed = False
+        while self.sales and (self.sales[0][0] < border or len(self.sales) > self.max_samples):
+            self._remove_oldest()
+            changed = True
+        if changed:
+            self._trimmed_mean = None
+
+    def add(self, sold_at: float, price: float) -> None:
+        """
+        Метод добавления продажи в окно.
+
+        :param sold_at: Время продажи в секундах.
+        :param price: Цена продажи.
+        """
+        self.sales.append((sold_at, price))
+        bisect.insort(self.prices, price)
+        self.total += price
+        self.newest = max(self.newest, sold_at)
+        self._trimmed_mean = None
+        self.evict(self.newest)
+
+    @property
+    def median(self) -> Optional[float]:
+        """
+        Медиана цен продаж в окне, либо None, если продаж нет.
+        """
+        count = len(self.prices)
+        if not count:
+            return None
+        if count % 2:
+            return self.prices[count // 2]
+        return (self.prices[count // 2 - 1] + self.prices[count // 2]) / 2
+
+    @property
+    def trimmed_mean(self) -> Optional[float]:
+        """
+        Усеченное среднее цен продаж в окне, либо None, если продаж нет.
+        """
+        if self._trimmed_mean is None and self.prices:
+            count = len(self.prices)
+            cut = int(count * self.trim)
+            if cut:
+                trimmed_total = self.total - sum(self.prices[:cut]) - sum(self.prices[count - cut:])
+            else:
+                trimmed_total = self.total
+            self._trimmed_mean = trimmed_total / (count - 2 * cut)
+        return self._trimmed_mean
+
+
+class CorridorStats:
+    """
+    Класс для подсчета средней цены продажи предметов в Steam прямо по потоку продаж, без периодического пересчета
+    всей таблицы.
+
+    Сначала окна заполняются из MySQL методом backfill, а затем методом poll подтягиваются только новые продажи.
+    Пока backfill не завершился, в окнах лежат только самые старые продажи, поэтому apply до этого ничего не меняет.
+    """
+
+    def __init__(self, catalog: CatalogIndex, table_name: str, price_column: str = "price",
+                 time_column: str = "sold_at", window: float = 7 * 24 * 3600, max_samples: int = 1000,
+                 trim: float = 0.1, min_volume: int = 5):
+        """
+        Магический метод инициализации экземпляра класса.
+
+        :param catalog: Общий каталог предметов.
+        :param table_name: Имя таблицы с продажами в Steam.
+        :param price_column: Колонка с ценой продажи.
+        :param time_column: Колонка со временем продажи.
+        :param window: Длина окна в секундах, по стандарту 7 дней.
+        :param max_samples: Максимальное количество продаж в окне одного предмета.
+        :param trim: Доля самых дешевых и самых дорогих продаж, которые отбрасываются при подсчете среднего.
+        :param min_volume: Минимальное количество продаж в окне, при котором свежей средней цене можно доверять.
+        """
+        self.catalog = catalog
+        self.table_name = table_name
+        self.price_column = price_column
+        self.time_column = time_column
+        self.window = window
+        self.max_samples = max_samples
+        self.trim = trim
+        self.min_volume = min_volume
+
+        self.items: Dict[int, ItemWindow] = {}
+        self.last_sale_id = 0
+        self.ready = False
+
+    def ingest(self, name_id: int, price: float, sold_at: float) -> None:
+        """
+        Метод добавления одной продажи.
+
+        :param name_id: Id предмета в каталоге.
+        :param price: Цена продажи.
+        :param sold_at: Время продажи в секундах.
+        """
+        item = self.items.get(name_id)
+        if item is None:
+            item = self.items[name_id] = ItemWindow(self.window, self.max_samples, self.trim)
+        item.add(sold_at, price)
+
+    def ingest_rows(self, rows: List[Dict]) -> None:
+        """
+        Метод добавления продаж из строк бд вида {"id": ..., "item_name": ..., "price": ..., "sold_at": ...}.
+
+        :param rows: Строки из бд, отсортированные по id.
+        """
+        get_id_encoded = self.catalog.get_id_encoded
+        for row in rows:
+            sold_at = row["sold_at"]
+            if isinstance(sold_at, datetime):
+                sold_at = sold_at.timestamp()
+            self.ingest(get_id_encoded(row["item_name"]), float(row["price"]), float(sold_at))
+            self.last_sale_id = row["id"]
+
+    async def poll(self, db, batch_size: int = 10000) -> int:
+        """
+        Метод для подтягивания из бд всех продаж, добавленных с прошлого обращения.
+
+        :param db: Экземпляр класса DatabaseModule.
+        :param batch_size: Сколько продаж забирать одним запросом.
+        :return: Сколько новых продаж добавлено.
+        """
+        ingested = 0
+        while True:
+            rows = await db.load_sales(self.table_name, since_id=self.last_sale_id, limit=batch_size,
+                                       price_column=self.price_column, time_column=self.time_column)
+            self.ingest_rows(rows)
+            ingested += len(rows)
+            if len(rows) < batch_size:
+                return ingested
+
+    async def backfill(self, db, batch_size: int = 10000) -> int:
+        """
+        Метод первичного заполнения окон продажами за последние window секунд.
+
+        :param db: Экземпляр класса DatabaseModule.
+        :param batch_size: Сколько продаж забирать одним запросом.
+        :return: Сколько продаж добавлено.
+        """
+        # Начинаем с пустых окон, чтобы повторный backfill после ошибки не добавил продажи дважды
+        self.ready = False
+        self.items = {}
+        since_time = datetime.fromtimestamp(time.time() - self.window)
+        self.last_sale_id = await db.get_first_sale_id(self.table_name, since_time, self.time_column) - 1
+        ingested = await self.poll(db, batch_size)
+        self.ready = True
+        print(f"Загружено продаж Steam для подсчета средней цены: {ingested}, предметов: {len(self.items)}")
+        return ingested
+
+    def get(self, name_id: int) -> Optional[Dict]:
+        """
+        Метод получения статистики продаж предмета.
+
+        :param name_id: Id предмета в каталоге.
+        :return: Словарь {"corridor_avg": ..., "median": ..., "volume": ...}, либо None, если продаж в окне нет.
+        """
+        item = self.items.get(name_id)
+        if item is None:
+            return None
+
+        item.evict(time.time())
+        if not len(item):
+            return None
+        return {"corridor_avg": item.trimmed_mean, "median": item.median, "volume": len(item)}
+
+    def apply(self, db_items: Dict) -> int:
+        """
+        Метод замены средней цены из бд на свежую из окна продаж для всех предметов с достаточным объемом продаж.
+
+        :param db_items: Словарь {id предмета в каталоге: {"corridor_avg": ...}} из бд, меняется на месте.
+        :return: Для скольких предметов цена была обновлена, 0 - если backfill еще не завершился.
+        """
+        if not self.ready:
+            return 0
+
+        now = time.time()
+        updated = 0
+        for name_id, item in self.items.items():
+            item.evict(now)
+            if len(item) >= self.min_volume:
+                db_items[name_id] = {"corridor_avg": item.trimmed_mean}
+                updated += 1
+        return updated
@@ -0,0 +1,249 @@
+import heapq
+import json
+import os
+from typing import Callable, List, Dict, Optional
+
+from catalog_module.catalog_manager import CatalogIndex
+
+
+class Strategy:
+    """
+    Класс с настройками одной стратегии отбора выгодных скинов.
+
+    Параметры, которые можно переопределить для отдельных предметов через overrides: fee, min_ratio, max_ratio,
+    min_corridor_avg, min_price, max_price.
+    """
+    OVERRIDABLE = ("fee", "min_ratio", "max_ratio", "min_corridor_avg", "min_price", "max_price")
+
+    def __init__(self, name: str = "default", fee: float = 0.856, min_ratio: float = 1.1, max_ratio: float = 1.9,
+                 min_corridor_avg: float = 0.1, min_price: float = 0.0, max_price: Optional[float] = None,
+                 top_n: int = 500, score: str = "profit_perc", blacklist: Optional[List[str]] = None,
+                 blacklist_contains: Optional[List[str]] = None, overrides: Optional[Dict[str, Dict]] = None):
+        """
+        Магический метод инициализации экземпляра класса. Значения по стандарту совпадают с прежними захардкоженными.
+
+        :param name: Имя стратегии, по нему чаты могут подписываться на скины конкретной стратегии.
+        :param fee: Множитель цены продажи в Steam после вычета комиссии.
+        :param min_ratio: Минимальное отношение цены продажи после комиссии к цене покупки.
+        :param max_ratio: Максимальное отношение, все что выше считаем ошибкой в данных.
+        :param min_corridor_avg: Минимальная средняя цена продажи в Steam.
+        :param min_price: Минимальная цена покупки на лисскинс.
+        :param max_price: Максимальная цена покупки на лисскинс. По стандарту None - без ограничения.
+        :param top_n: Сколько самых выгодных скинов стратегия отдает за один парсинг.
+        :param score: Поле, по которому сортируются скины: "profit_perc" или "profit_abs".
+        :param blacklist: Точные имена предметов, которые стратегия пропускает.
+        :param blacklist_contains: Подстроки, предметы с которыми в имени стратегия пропускает.
+        :param overrides: Словарь {имя предмета: {параметр: значение}} с настройками для отдельных предметов.
+        """
+        if score not in ("profit_perc", "profit_abs"):
+            raise ValueError(f"Неизвестное поле для сортировки в стратегии {name}: {score}")
+
+        self.name = name
+        self.fee = fee
+        self.min_ratio = min_ratio
+        self.max_ratio = max_ratio
+        self.min_corridor_avg = min_corridor_avg
+        self.min_price = min_price
+        self.max_price = max_price
+        self.top_n = top_n
+        self.score = score
+        self.blacklist = blacklist or []
+        self.blacklist_contains = blacklist_contains or []
+        self.overrides = overrides or {}
+
+        for item_name, override in self.overrides.items():
+            unknown = set(override) - set(self.OVERRIDABLE)
+            if unknown:
+                raise ValueError(f"Неизвестные параметры для {item_name} в стратегии {name}: {', '.join(unknown)}")
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Strategy":
+        """
+        Метод для создания стратегии из словаря, например из json конфига.
+
+        :param data: Словарь с ключами, совпадающими с параметрами __init__.
+        :return: Экземпляр класса Strategy.
+        """
+        return cls(**data)
+
+    def compile(self, catalog: CatalogIndex) -> Callable[[int, float, float], Optional[Dict]]:
+        """
+        Метод для однократной подготовки стратегии к применению: все проверки собираются в одну функцию, а черный
+        список и переопределения заранее переводятся в id каталога для быстрой проверки.
+
+        :param catalog: Каталог предметов, по которому имена из конфига переводятся в id.
+        :return: Функция, которая принимает id предмета в каталоге, среднюю цену продажи в Steam и минимальную цену
+        на лисскинс и возвращает словарь с расчетом выгоды, либо None, если предмет не подходит под стратегию.
+        """
+        base = (self.fee, self.min_ratio, self.max_ratio, self.min_corridor_avg, self.min_price,
+                self.max_price if self.max_price is not None else float("inf"))
+        overrides = {}
+        for item_name, override in self.overrides.items():
+            params = dict(zip(self.OVERRIDABLE, base), **override)
+            if params["max_price"] is None:
+                params["max_price"] = float("inf")
+            overrides[catalog.get_id(item_name)] = tuple(params[key] for key in self.OVERRIDABLE)
+
+        blacklist = frozenset(catalog.get_id(item_name) for item_name in self.blacklist)
+        blacklist_contains = tuple(self.blacklist_contains)
+        names = catalog.names
+
+        def evaluate(name_id: int, corridor_avg: float, min_price: float) -> Optional[Dict]:
+            fee, min_ratio, max_ratio, min_corridor_avg, min_buy, max_buy = overrides.get(name_id, base)
+
+            if corridor_avg <= min_corridor_avg or not min_buy <= min_price <= max_buy or min_price <= 0:
+                return None
+
+            selling_after_fee = corridor_avg * fee
+            ratio = selling_after_fee / min_price
+            if not min_ratio <= ratio <= max_ratio:
+                return None
+
+            if name_id in blacklist or any(part in names[name_id] for part in blacklist_contains):
+                return None
+
+            profit_abs = selling_after_fee - min_price
+            profit_perc = (ratio - 1.0) * 100.0
+            skin = {
+                "game_id": "cs2",
+                "name_id": name_id,
+                "item_name": names[name_id],
+                "corridor_avg": round(corridor_avg, 2),
+                "lis_min_price": round(min_price, 2),
+                "selling_after_fee": round(selling_after_fee, 2),
+                "profit_abs": round(profit_abs, 2),
+                "profit_perc": round(profit_perc, 2)
+            }
+            return skin
+
+        return evaluate
+
+
+class StrategyEngine:
+    """
+    Класс для применения нескольких стратегий к одной выгрузке скинов за один проход.
+
+    Стратегии читаются из json конфига вида {"strategies": [{"name": "...", ...}, ...]} и перечитываются без
+    перезапуска, как только файл конфига меняется. Если конфиг не задан, используется одна стратегия по стандарту.
+    """
+
+    def __init__(self, catalog: CatalogIndex, config_path: Optional[str] = None):
+        """
+        Магический метод инициализации экземпляра класса.
+
+        :param catalog: Общий каталог предметов.
+        :param config_path: Путь к json конфигу стратегий. По стандарту None - одна стратегия "default".
+        """
+        self.catalog = catalog
+        self.config_path = config_path
+        self.config_mtime: Optional[float] = None
+        self.strategies: List[Strategy] = [Strategy()]
+        self.compiled: List[tuple] = [(strategy.name, strategy.compile(catalog)) for strategy in self.strategies]
+
+        if self.config_path:
+            self.reload_if_changed()
+
+    def reload_if_changed(self) -> bool:
+        """
+        Метод для перечитывания конфига стратегий, если файл изменился с прошлого чтения. При ошибке в конфиге
+        продолжаем работать со старыми стратегиями.
+
+        :return: True, если стратегии были перечитаны.
+        """
+        if not self.config_path:
+            return False
+
+        try:
+            mtime = os.path.getmtime(self.config_path)
+            if mtime == self.config_mtime:
+                return False
+
+            with open(self.config_path, "r", encoding="utf-8") as file:
+                config = json.load(file)
+
+            strategies = [Strategy.from_dict(data) for data in config["strategies"]]
+            if not strategies:
+                raise ValueError("В конфиге не задано ни одной стратегии")
+            names = [strategy.name for strategy in strategies]
+            if len(set(names)) != len(names):
+                raise ValueError("Имена стратегий в конфиге должны быть уникальными")
+
+            compiled = [(strategy.name, strategy.compile(self.catalog)) for strategy in strategies]
+
+        except Exception as e:
+            print(f"Ошибка при загрузке конфига стратегий, продолжаем со старыми стратегиями: {e}")
+            return False
+
+        self.strategies = strategies
+        self.compiled = compiled
+        self.config_mtime = mtime
+        print(f"Загружены стратегии: {', '.join(names)}")
+        return True
+
+    @property
+    def min_corridor_avg(self) -> float:
+        """
+        Минимальная средняя цена продажи среди всех стратегий и их переопределений, по ней фильтруется запрос к бд.
+        """
+        values = [strategy.min_corridor_avg for strategy in self.strategies]
+        for strategy in self.strategies:
+            values.extend(override["min_corridor_avg"] for override in strategy.overrides.values()
+                          if "min_corridor_avg" in override)
+        return min(values)
+
+    @property
+    def total_limit(self) -> int:
+        """
+        Сколько скинов всего могут отдать все стратегии за один парсинг.
+        """
+        return sum(strategy.top_n for strategy in self.strategies)
+
+    def evaluate(self, db_items: Dict, lis_items: Dict) -> List[Dict]:
+        """
+        Метод для применения всех стратегий к выгрузке за один проход по предметам.
+
+        Если предмет подошел под несколько стратегий, он возвращается один раз, а в поле "strategies" перечислены
+        все стратегии, которые его отобрали. Расчет выгоды берется у первой из них в порядке конфига.
+
+        Стратегии сортируют скины по разным полям (проценты или доллары), поэтому в поле "score" кладется не само
+        значение, а место скина в топе своей стратегии: от 1.0 у лучшего до 1 / top у последнего. Так скины разных
+        стратегий можно сравнивать в одной очереди, а у скина нескольких стратегий берется лучшее из его мест.
+
+        :param db_items: Словарь {id предмета в каталоге: {"corridor_avg": ...}} из базы данных.
+        :param lis_items: Словарь {id предмета в каталоге: {"min_price": ..., ...}} с лисскинс, поле "item_id"
+        переносится в результат, если оно есть.
+        :return: Список словарей с данными по выгодным скинам.
+        """
+        compiled = self.compiled
+        found: Dict[str, List[Dict]] = {name: [] for name, _ in compiled}
+
+        for name_id, db_item in db_items.items():
+            lis_item = lis_items.get(name_id)
+            if lis_item is None:
+                continue
+
+            corridor_avg = db_item["corridor_avg"]
+            min_price = lis_item["min_price"]
+            for strategy_name, evaluate in compiled:
+                skin = evaluate(name_id, corridor_avg, min_price)
+                if skin is not None:
+                    if "item_id" in lis_item:
+                        skin["item_id"] = lis_item["item_id"]
+                    found[strategy_name].append(skin)
+
+        # Каждая стратегия оставляет только свой топ, а совпадающие между стратегиями скины объединяем
+        results: Dict[int, Dict] = {}
+        for strategy in self.strategies:
+            top = heapq.nlargest(strategy.top_n, found[strategy.name], key=lambda x, key=strategy.score: x[key])
+            for rank, skin in enumerate(top):
+                score = (len(top) - rank) / len(top)
+                if skin["name_id"] in results:
+                    result = results[skin["name_id"]]
+                    result["strategies"].append(strategy.name)
+                    result["score"] = max(result["score"], score)
+                else:
+                    skin["strategies"] = [strategy.name]
+                    skin["score"] = score
+                    results[skin["name_id"]] = skin
+
+        return list(results.values())
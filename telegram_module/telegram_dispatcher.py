@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+from typing import List, Dict, Optional
+
+from skin_module.work_queue import WorkQueue, run_consumers
+from telegram_module.telegram_manager import TelegramBot
+
+
+class ChatConfig:
+    """
+    Класс с настройками одного чата для рассылки: id чата, фильтры по скинам и ограничение частоты отправки.
+    """
+
+    def __init__(self, chat_id: str, min_profit_perc: float = 0.0, min_price: float = 0.0,
+                 max_price: Optional[float] = None, strategies: Optional[List[str]] = None,
+                 send_interval: float = 5.0, queue_size: int = 20, ttl: float = 300.0):
+        """
+        Магический метод инициализации экземпляра класса.
+
+        :param chat_id: Id чата или канала в телеграм.
+        :param min_profit_perc: Минимальная выгода скина в процентах, начиная с которой он отправляется в чат.
+        :param min_price: Минимальная цена покупки скина на лисскинс.
+        :param max_price: Максимальная цена покупки скина на лисскинс. По стандарту None - без ограничения.
+        :param strategies: Имена стратегий, скины которых отправляются в чат. По стандарту None - всех стратегий.
+        :param send_interval: Минимальный интервал между сообщениями в этот чат в секундах.
+        :param queue_size: Сколько сообщений может ждать отправки в этот чат. При переполнении из очереди чата
+        выбрасываются скины с наименьшей оценкой.
+        :param ttl: Сколько секунд сообщение о скине актуально в очереди чата, устаревшие сообщения не отправляются.
+        """
+        self.chat_id = chat_id
+        self.min_profit_perc = min_profit_perc
+        self.min_price = min_price
+        self.max_price = max_price
+        self.strategies = set(strategies) if strategies is not None else None
+        self.send_interval = send_interval
+        self.queue_size = queue_size
+        self.ttl = ttl
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ChatConfig":
+        """
+        Метод для создания настроек чата из словаря, например из json.
+
+        :param data: Словарь с ключами, совпадающими с параметрами __init__, обязателен только chat_id.
+        :return: Экземпляр класса ChatConfig.
+        """
+        return cls(
+            chat_id=str(data["chat_id"]),
+            min_profit_perc=float(data.get("min_profit_perc", 0.0)),
+            min_price=float(data.get("min_price", 0.0)),
+            max_price=float(data["max_price"]) if data.get("max_price") is not None else None,
+            strategies=data.get("strategies"),
+            send_interval=float(data.get("send_interval", 5.0)),
+            queue_size=int(data.get("queue_size", 20)),
+            ttl=float(data.get("ttl", 300.0)),
+        )
+
+    def accepts(self, skin: Dict) -> bool:
+        """
+        Метод проверки, подходит ли скин под фильтры чата.
+
+        :param skin: Словарь с информацией о скине.
+        :return: True, если скин нужно отправить в этот чат.
+        """
+        if skin["profit_perc"] < self.min_profit_perc:
+            return False
+        if skin["lis_min_price"] < self.min_price:
+            return False
+        if self.max_price is not None and skin["lis_min_price"] > self.max_price:
+            return False
+        if self.strategies is not None and self.strategies.isdisjoint(skin.get("strategies", ())):
+            return False
+        return True
+
+
+def load_chat_configs() -> List[ChatConfig]:
+    """
+    Функция загрузки списка чатов для рассылки из переменных окружения.
+
+    TELEGRAM_CHATS - json список чатов с фильтрами, например:
+    [{"chat_id": "-100123", "min_profit_perc": 20, "max_price": 50}, {"chat_id": "-100456"}].
+    Если TELEGRAM_CHATS не задан, используется один чат из TELEGRAM_CHAT_ID без фильтров.
+
+    :return: Список настроек чатов.
+    """
+    chats_json = os.getenv("TELEGRAM_CHATS")
+    if chats_json:
+        return [ChatConfig.from_dict(chat) for chat in json.loads(chats_json)]
+
+    return [ChatConfig(chat_id=os.getenv("TELEGRAM_CHAT_ID"))]
+
+
+class TelegramDispatcher:
+    """
+    Класс для рассылки сообщений о скинах сразу в несколько чатов.
+
+    У каждого чата своя очередь WorkQueue: сообщения в ней отправляются по убыванию оценки скина, устаревшие и
+    не поместившиеся в очередь скины с наименьшей оценкой выбрасываются только из этого чата. Все чаты отправляются
+    параллельно через одну общую сессию бота, каждый со своим интервалом, поэтому медленный или ограниченный по
+    частоте чат не задерживает остальные.
+    """
+
+    def __init__(self, tg_bot: TelegramBot, chats: List[ChatConfig]):
+        """
+        Магический метод инициализации экземпляра класса.
+
+        :param tg_bot: Экземпляр класса TelegramBot, через который отправляются сообщения.
+        :param chats: Список настроек чатов для рассылки.
+        """
+        if not chats:
+            raise ValueError("Не задан ни один чат для рассылки")
+
+        self.tg_bot = tg_bot
+        self.chats = chats
+        self.queues: Dict[str, WorkQueue] = {chat.chat_id: WorkQueue(capacity=chat.queue_size, item_ttl=chat.ttl)
+                                             for chat in chats}
+
+    async def publish(self, skin: Dict, message: str) -> int:
+        """
+        Метод для постановки уже отрендеренного сообщения о скине в очереди всех подходящих чатов.
+        Сообщение рендерится один раз и одна и та же строка переиспользуется для всех чатов.
+
+        Метод не ждет места в очередях чатов: если очередь чата заполнена, из нее выбрасывается скин с наименьшей
+        оценкой, возможно и этот. Скин, который уже отправлялся в чат за последние ttl секунд, повторно не ставится.
+
+        :param skin: Словарь с информацией о скине, по нему проверяются фильтры чатов.
+        :param message: Готовый текст сообщения.
+        :return: Количество чатов, которым подошел скин.
+        """
+        entry = {
+            "name_id": skin["name_id"],
+            "item_name": skin["item_name"],
+            "profit_perc": skin["profit_perc"],
+            "score": skin.get("score", skin["profit_perc"]),
+            "message": message,
+        }
+
+        delivered = 0
+        for chat in self.chats:
+            if chat.accepts(skin):
+                await self.queues[chat.chat_id].put_many([entry])
+                delivered += 1
+        return delivered
+
+    async def _chat_worker(self, chat: ChatConfig) -> None:
+        """
+        Метод бесконечной отправки сообщений из очереди одного чата с заданным для него интервалом. Отправка не
+        повторяется, чтобы не задваивать сообщения в чате.
+
+        :param chat: Настройки чата.
+        """
+        async def send(entry: Dict) -> None:
+            await self.tg_bot.send_message(entry["message"], chat_id=chat.chat_id)
+
+        await run_consumers(self.queues[chat.chat_id], send, pause=chat.send_interval, at_most_once=True)
+
+    async def run(self) -> None:
+        """
+        Метод для параллельного запуска отправки во все чаты.
+        """
+        await asyncio.gather(*(self._chat_worker(chat) for chat in self.chats))
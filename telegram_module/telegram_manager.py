@@ -1,11 +1,16 @@
 import aiohttp
+from typing import Optional
 
 
 class TelegramBot:
     """
     Класс для работы с телеграм ботом, реализованный только на ассинхронных запросах.
 
-    Метод send_message: отправляет сообщение в указанный при инициализации канал от лица бота
+    Метод send_message: отправляет сообщение в указанный при инициализации канал (либо в любой переданный чат)
+    от лица бота.
+
+    Магические методы __aenter__ и __aexit__ открывают одну общую сессию на все отправки внутри async with,
+    без них на каждое сообщение открывается и закрывается своя сессия.
     """
 
     def __init__(self, bot_token, chat_id):
@@ -13,39 +18,70 @@ class TelegramBot:
         Магический метод инициализации экземпляра класса, принимает токен бота и id чата, в который нужно писать.
 
         :param bot_token: Токен бота в телеграм.
-        :param chat_id: Id чата в телеграм.
+        :param chat_id: Id чата в телеграм, в который бот пишет по стандарту.
         """
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.session = None
 
-    async def send_message(self, text: str) -> None:
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def warm_up(self) -> None:
+        """
+        Метод для заблаговременной установки соединения с телеграм через общую сессию и проверки токена бота.
+        Ошибки не критичны и только выводятся.
+        """
+        try:
+            async with self.session.get(f"https://api.telegram.org/bot{self.bot_token}/getMe") as response:
+                if response.status != 200:
+                    print(f"Ошибка при проверке токена бота телеграм: {await response.text()}")
+        except Exception as e:
+            print(f"Не удалось заранее подключиться к телеграм: {e}")
+
+    async def send_message(self, text: str, chat_id: Optional[str] = None) -> bool:
         """
         Метод для отправки сообщения в канал от лица бота.
         :param text: Текст, который отправит бот в канал.
+        :param chat_id: Id чата, в который отправить сообщение. По стандарту None - чат, заданный при инициализации.
+
+        :return: True, если сообщение отправлено, иначе False.
         """
 
         # Создаем ссылку и параметры для запроса
         url_for_request = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
         parameters_for_request = {
-            "chat_id": self.chat_id,
+            "chat_id": chat_id if chat_id is not None else self.chat_id,
             "text": text,
             "parse_mode": "Markdown",
             "disable_web_page_preview": True
         }
 
+        # Если общая сессия не открыта через async with - открываем ассинхронную сессию только на эту отправку
+        session = self.session or aiohttp.ClientSession()
+
         # try - except для отлова непредвиденных ошибок
         try:
-            # Открываем ассинхронную сессию для отправки сообщения
-            self.session = aiohttp.ClientSession()
-            response = await self.session.post(url_for_request, json=parameters_for_request)
-
-            # Если сообщение не удалось отправить - выводим ошибку
-            if response.status != 200:
-                error = await response.text()
-                print(f"Ошибка при отправке сообщения в телеграм: {error}")
+            async with session.post(url_for_request, json=parameters_for_request) as response:
+
+                # Если сообщение не удалось отправить - выводим ошибку
+                if response.status != 200:
+                    error = await response.text()
+                    print(f"Ошибка при отправке сообщения в телеграм: {error}")
+                    return False
+                return True
+
         except Exception as e:
             print(f"Непредвиденная ошибка при отправке сообщения в телеграм: {e}")
+            return False
 
-        # После отправки сообщения закрываем ссесию во избежания ошибок и проблем
-        await self.session.close()
+        finally:
+            # После отправки сообщения закрываем временную ссесию во избежания ошибок и проблем
+            if session is not self.session:
+                await session.close()